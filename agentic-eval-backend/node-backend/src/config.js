@@ -2,6 +2,21 @@
 
 require('dotenv').config();
 
+// Dimensions whose Python worker implements --serve
+const SERVE_CAPABLE_DIMENSIONS = ['instruction'];
+
+function parsePersistentDimensions(value) {
+  const dimensions = value.split(',').map(d => d.trim()).filter(Boolean);
+  const unsupported = dimensions.filter(d => !SERVE_CAPABLE_DIMENSIONS.includes(d));
+  if (unsupported.length > 0) {
+    throw new Error(
+      `PERSISTENT_WORKER_DIMENSIONS lists dimensions without --serve support: ${unsupported.join(', ')} ` +
+      `(supported: ${SERVE_CAPABLE_DIMENSIONS.join(', ')})`
+    );
+  }
+  return dimensions;
+}
+
 const config = {
   // Server Configuration
   PORT: process.env.PORT || 3001,
@@ -26,6 +41,9 @@ const config = {
 
   // Worker Configuration
   PYTHON_WORKERS_PATH: process.env.PYTHON_WORKERS_PATH || '../python-workers',
+  // Dimensions whose Python worker stays alive and takes newline-delimited JSON jobs (--serve);
+  // only workers that implement --serve may be listed
+  PERSISTENT_WORKER_DIMENSIONS: parsePersistentDimensions(process.env.PERSISTENT_WORKER_DIMENSIONS || 'instruction'),
   
   // API Configuration
   MAX_FILE_SIZE: process.env.MAX_FILE_SIZE || '10mb',
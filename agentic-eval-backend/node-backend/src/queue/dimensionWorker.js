@@ -15,6 +15,10 @@ class DimensionWorker {
     this.workerScript = `${dimension}_worker.py`;
     this.processingCount = 0;
     this.pythonExecutable = null;
+
+    // Persistent (--serve) worker state: { process, buffer, pendingJobs, detached }
+    this.persistent = config.PERSISTENT_WORKER_DIMENSIONS.includes(dimension);
+    this.serve = null;
   }
 
   /**
@@ -171,6 +175,11 @@ class DimensionWorker {
       console.log(`${this.dimension} worker waiting for ${this.processingCount} tasks to complete...`);
       await this.sleep(1000);
     }
+
+    if (this.serve) {
+      this.serve.process.stdin.end();
+      this.serve = null;
+    }
     
     await redisClient.setWorkerStatus(this.workerId, 'stopped');
     console.log(`${this.dimension} worker stopped`);
@@ -249,19 +258,30 @@ class DimensionWorker {
     }
   }
 
+  /**
+   * Prepare input data for the Python worker
+   */
+  buildWorkerInput(task) {
+    return {
+      response_id: task.response_id,
+      prompt: task.prompt,
+      response_text: task.response_text,
+      context: task.context || '',
+      reference: task.reference || '',
+      metadata: task.metadata || {}
+    };
+  }
+
   async runPythonWorker(task) {
+    if (this.persistent) {
+      return this.runPersistentWorker(task);
+    }
+
     return new Promise((resolve, reject) => {
       const workerPath = path.join(this.pythonPath, this.workerScript);
 
       // Prepare input data for the Python worker
-      const inputData = {
-        response_id: task.response_id,
-        prompt: task.prompt,
-        response_text: task.response_text,
-        context: task.context || '',
-        reference: task.reference || '',
-        metadata: task.metadata || {}
-      };
+      const inputData = this.buildWorkerInput(task);
 
       // Use the dynamically found Python executable
       const pythonExe = this.pythonExecutable;
@@ -281,8 +301,10 @@ class DimensionWorker {
       let stdout = '';
       let stderr = '';
 
+      // Decode as a stream so multibyte UTF-8 split across chunks stays intact
+      worker.stdout.setEncoding('utf8');
       worker.stdout.on('data', (data) => {
-        stdout += data.toString();
+        stdout += data;
       });
 
       worker.stderr.on('data', (data) => {
@@ -342,6 +364,148 @@ class DimensionWorker {
     });
   }
 
+  /**
+   * Start a long-lived Python worker that reads one JSON job per line on stdin
+   * and writes one JSON result per line on stdout, in the same order.
+   * Output buffer and pending-job queue belong to the process, so results can
+   * never be matched against another process's jobs.
+   */
+  spawnServeProcess() {
+    const workerPath = path.join(this.pythonPath, this.workerScript);
+    console.log(`Spawning persistent Python worker: ${this.pythonExecutable} ${workerPath} --serve`);
+
+    const worker = spawn(this.pythonExecutable, [workerPath, '--serve'], {
+      cwd: this.pythonPath,
+      stdio: ['pipe', 'pipe', 'pipe'],
+      env: {
+        ...process.env,
+        PYTHONPATH: this.pythonPath,
+        PYTHONUNBUFFERED: '1'
+      }
+    });
+
+    const serve = { process: worker, buffer: '', pendingJobs: [], detached: false };
+
+    // Decode as a stream so multibyte UTF-8 split across chunks stays intact
+    worker.stdout.setEncoding('utf8');
+    worker.stdout.on('data', (data) => {
+      if (serve.detached) {
+        return; // Late output from a process whose jobs were already failed
+      }
+      serve.buffer += data;
+
+      let newlineIndex;
+      while ((newlineIndex = serve.buffer.indexOf('\n')) >= 0) {
+        const line = serve.buffer.slice(0, newlineIndex).trim();
+        serve.buffer = serve.buffer.slice(newlineIndex + 1);
+        if (line) {
+          this.handleServeLine(serve, line);
+        }
+      }
+    });
+
+    worker.stderr.on('data', (data) => {
+      console.log(`[${this.dimension} worker stderr]:`, data.toString().trim());
+    });
+
+    worker.stdin.on('error', (error) => {
+      // Broken pipe: the close handler fails the pending jobs
+      console.error(`${this.dimension} persistent worker stdin error:`, error.message);
+    });
+
+    worker.on('close', (code) => {
+      console.log(`${this.dimension} persistent worker closed with code ${code}`);
+      this.detachServeProcess(serve, new Error(`${this.dimension} persistent worker exited with code ${code}`));
+    });
+
+    worker.on('error', (error) => {
+      console.error(`Failed to spawn ${this.dimension} persistent worker:`, error);
+      this.detachServeProcess(serve, new Error(`Failed to spawn ${this.dimension} worker: ${error.message}`));
+    });
+
+    return serve;
+  }
+
+  /**
+   * Stop routing jobs to a serve process, fail everything still queued on it
+   * and ignore any further output it produces
+   */
+  detachServeProcess(serve, error) {
+    serve.detached = true;
+    serve.buffer = '';
+    if (this.serve === serve) {
+      this.serve = null;
+    }
+    for (const job of serve.pendingJobs.splice(0)) {
+      clearTimeout(job.timeout);
+      job.reject(error);
+    }
+  }
+
+  handleServeLine(serve, line) {
+    const job = serve.pendingJobs.shift();
+    if (!job) {
+      console.error(`Unexpected output from ${this.dimension} persistent worker:`, line);
+      return;
+    }
+
+    clearTimeout(job.timeout);
+
+    try {
+      const result = JSON.parse(line);
+      if (result.error) {
+        job.reject(new Error(`${this.dimension} worker error: ${result.error}`));
+      } else if (typeof result.score === 'number' && result.score >= 0 && result.score <= 1) {
+        job.resolve({
+          score: result.score,
+          details: result.details || {}
+        });
+      } else {
+        job.reject(new Error(`Invalid score format from ${this.dimension} worker: ${line}`));
+      }
+    } catch (error) {
+      job.reject(new Error(`Failed to parse ${this.dimension} worker output: ${error.message}`));
+    }
+  }
+
+  async runPersistentWorker(task) {
+    return new Promise((resolve, reject) => {
+      if (!this.serve) {
+        this.serve = this.spawnServeProcess();
+      }
+
+      const serve = this.serve;
+      const job = { resolve, reject };
+
+      // Results come back in order, so a stuck job blocks the ones behind it:
+      // on timeout, detach the process (failing its queued jobs so no late
+      // line can be matched to the wrong job) and let the next task respawn it
+      job.timeout = setTimeout(() => {
+        const timeoutError = new Error(`${this.dimension} worker timed out after 2 minutes`);
+        const index = serve.pendingJobs.indexOf(job);
+        if (index >= 0) {
+          serve.pendingJobs.splice(index, 1);
+        }
+        reject(timeoutError);
+        this.detachServeProcess(serve, new Error(`${this.dimension} worker restarted after a timed-out job`));
+        serve.process.kill('SIGTERM');
+      }, 120000); // 2 minute timeout
+
+      serve.pendingJobs.push(job);
+
+      try {
+        serve.process.stdin.write(JSON.stringify(this.buildWorkerInput(task)) + '\n');
+      } catch (error) {
+        clearTimeout(job.timeout);
+        const index = serve.pendingJobs.indexOf(job);
+        if (index >= 0) {
+          serve.pendingJobs.splice(index, 1);
+        }
+        reject(new Error(`Failed to send input to ${this.dimension} worker: ${error.message}`));
+      }
+    });
+  }
+
   async getStatus() {
     return {
       worker_id: this.workerId,
@@ -350,7 +514,9 @@ class DimensionWorker {
       processing_count: this.processingCount,
       python_path: this.pythonPath,
       python_executable: this.pythonExecutable,
-      worker_script: this.workerScript
+      worker_script: this.workerScript,
+      persistent: this.persistent,
+      persistent_pending: this.serve ? this.serve.pendingJobs.length : 0
     };
   }
 
@@ -68,6 +68,9 @@ def detect_assumption_patterns(text):
     return assumptions
 
 
+_STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+
+
 def check_assumption_support(assumptions, prompt, context):
     """Check if assumptions are supported by provided context"""
     if not assumptions:
@@ -87,8 +90,7 @@ def check_assumption_support(assumptions, prompt, context):
     for assumption in assumptions:
         assumption_words = set(assumption.lower().split())
         # Remove common words
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-        assumption_keywords = assumption_words - stop_words
+        assumption_keywords = assumption_words - _STOP_WORDS
         
         for source in support_sources:
             source_words = set(source.lower().split())
@@ -1,104 +1,227 @@
 #!/usr/bin/env python3
 """
-Simplified Hallucination Worker
-Uses keyword matching and basic fact checking patterns
+Hallucination Worker
+Uses keyword matching and basic fact checking patterns by default, or NLI
+entailment over retrieved context when ML models are available.
+Select with the "mode" input field or HALLUC_MODE env var ("simple" or "ml").
 """
 
+import os
 import sys
 import json
 import re
 import time
 
+try:
+    import orjson
+except ImportError:  # Fall back to stdlib json
+    orjson = None
+
 
 def load_json_input():
     """Load JSON input from stdin"""
     try:
-        input_data = sys.stdin.read().strip()
-        return json.loads(input_data) if input_data else {}
+        input_data = sys.stdin.buffer.read().strip()
+        if not input_data:
+            return {}
+        return orjson.loads(input_data) if orjson else json.loads(input_data)
     except Exception as e:
         print(f"Input error: {e}", file=sys.stderr)
         return {}
 
 
+_NL = b'\n'
+
+
+def write_json(result):
+    """Write a JSON object as a single line to stdout"""
+    out = sys.stdout.buffer
+    out.write(orjson.dumps(result) if orjson else json.dumps(result).encode())
+    out.write(_NL)
+    out.flush()
+
+
 def return_score(score, details=None):
     """Return score as JSON to stdout"""
     result = {
         "score": max(0.0, min(1.0, float(score))),
         "details": details or {}
     }
-    print(json.dumps(result))
-    sys.stdout.flush()
+    write_json(result)
 
 
 def return_error(error_message):
     """Return error and exit"""
     result = {"score": 0.0, "error": error_message, "details": {}}
-    print(json.dumps(result))
+    write_json(result)
     sys.exit(1)
 
 
+# Patterns for factual statements
+_FACTUAL_PATTERNS = [
+    re.compile(r'[A-Z][^.!?]*(?:is|are|was|were|will be|has|have|had)[^.!?]*[.!?]'),
+    re.compile(r'[A-Z][^.!?]*\b\d+%[^.!?]*[.!?]'),  # Percentage claims
+    re.compile(r'[A-Z][^.!?]*\bin \d{4}[^.!?]*[.!?]'),  # Year references
+    re.compile(r'[A-Z][^.!?]*(?:according to|research shows|studies)[^.!?]*[.!?]')
+]
+
+
 def extract_factual_claims(text):
     """Extract potential factual claims"""
     claims = []
     
-    # Patterns for factual statements
-    patterns = [
-        r'[A-Z][^.!?]*(?:is|are|was|were|will be|has|have|had)[^.!?]*[.!?]',
-        r'[A-Z][^.!?]*\b\d+%[^.!?]*[.!?]',  # Percentage claims
-        r'[A-Z][^.!?]*\bin \d{4}[^.!?]*[.!?]',  # Year references
-        r'[A-Z][^.!?]*(?:according to|research shows|studies)[^.!?]*[.!?]'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text)
-        claims.extend(matches)
+    for pattern in _FACTUAL_PATTERNS:
+        claims.extend(pattern.findall(text))
     
     return [claim.strip() for claim in claims[:5]]  # Limit to 5 claims
 
 
-def check_context_support(claims, context):
-    """Check if claims are supported by context"""
+_STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+
+
+def calculate_claim_support(claims, context):
+    """Return per-claim keyword support ratios, parallel to claims"""
     if not context or not claims:
-        return []
+        return [0.0] * len(claims)
     
-    supported_claims = []
-    context_lower = context.lower()
+    context_words = set(context.lower().split())
     
+    support_ratios = []
     for claim in claims:
-        claim_words = set(claim.lower().split())
-        context_words = set(context_lower.split())
-        
         # Remove common words
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-        claim_keywords = claim_words - stop_words
-        
+        claim_keywords = set(claim.lower().split()) - _STOP_WORDS
         if claim_keywords:
             overlap = len(claim_keywords.intersection(context_words))
-            support_ratio = overlap / len(claim_keywords)
-            
-            if support_ratio >= 0.3:  # At least 30% overlap
-                supported_claims.append(claim)
+            support_ratios.append(overlap / len(claim_keywords))
+        else:
+            support_ratios.append(0.0)
     
-    return supported_claims
+    return support_ratios
+
+
+_HALLUCINATION_PATTERNS = [
+    re.compile(r'\b(?:definitely|certainly|absolutely|clearly|obviously)\b.*\b(?:will|must|always)\b'),
+    re.compile(r'\bexactly \d+%\b'),  # Very specific percentages without source
+    re.compile(r'\b(?:all|every|never|always|no one|everyone)\b.*\b(?:agree|believe|know)\b'),
+    re.compile(r'\b(?:recent studies|new research|experts)\b.*(?:without citing)'),
+]
 
 
 def detect_hallucination_indicators(text):
     """Detect patterns that might indicate hallucination"""
-    hallucination_patterns = [
-        r'\b(?:definitely|certainly|absolutely|clearly|obviously)\b.*\b(?:will|must|always)\b',
-        r'\bexactly \d+%\b',  # Very specific percentages without source
-        r'\b(?:all|every|never|always|no one|everyone)\b.*\b(?:agree|believe|know)\b',
-        r'\b(?:recent studies|new research|experts)\b.*(?:without citing)',
-    ]
-    
+    text_lower = text.lower()
     indicators = 0
-    for pattern in hallucination_patterns:
-        if re.search(pattern, text.lower()):
+    for pattern in _HALLUCINATION_PATTERNS:
+        if pattern.search(text_lower):
             indicators += 1
     
     return indicators
 
 
+# Scoring modes accepted by HallucinationDetector
+_MODES = ('simple', 'ml')
+
+
+class HallucinationDetector:
+    """Scores claim support against context.
+    
+    'simple' mode uses keyword overlap; 'ml' mode retrieves evidence with
+    sentence embeddings and checks entailment with the shared NLI model,
+    falling back to 'simple' when the ML dependencies or models are unavailable.
+    """
+    
+    def __init__(self, mode='simple'):
+        if mode not in _MODES:
+            print(f"Unknown hallucination mode {mode!r}, using simple mode", file=sys.stderr)
+            mode = 'simple'
+        self.mode = mode
+        self.keyword_threshold = 0.3  # Keyword overlap needed in simple mode
+        self.entailment_threshold = 0.4  # Entailment probability needed in ml mode
+    
+    @property
+    def support_threshold(self):
+        return self.entailment_threshold if self.mode == 'ml' else self.keyword_threshold
+    
+    def calculate_claim_support(self, claims, context):
+        """Return per-claim support scores, parallel to claims"""
+        if self.mode == 'ml':
+            context_sentences = [s.strip() for s in re.split(r'[.!?]+', context) if s.strip()]
+            if not claims or not context_sentences:
+                return [0.0] * len(claims)  # Nothing to verify against, skip the model loads
+            try:
+                from shared.model_loader import model_loader
+                # Loader errors are otherwise swallowed into neutral scores, so
+                # make sure both models actually load before trusting them
+                model_loader.load_embedding_model()
+                model_loader.get_nli_model()
+            except Exception as e:
+                print(f"ML models unavailable, using simple mode: {e}", file=sys.stderr)
+                self.mode = 'simple'
+            else:
+                return self._calculate_nli_support(claims, context_sentences)
+        
+        return calculate_claim_support(claims, context)
+    
+    def _calculate_nli_support(self, claims, context_sentences):
+        """Best entailment probability of each claim against retrieved context sentences"""
+        from shared.model_loader import model_loader
+        
+        evidence = model_loader.retrieve_relevant_context(claims, context_sentences)
+        
+        # Verify every (evidence, claim) pair in one batched NLI call
+        pairs = []
+        owners = []
+        for claim_index, (claim, evidence_indices) in enumerate(zip(claims, evidence)):
+            for i in evidence_indices:
+                pairs.append((context_sentences[i], claim))
+                owners.append(claim_index)
+        
+        support_scores = [0.0] * len(claims)
+        for claim_index, prediction in zip(owners, model_loader.predict_nli_batch(pairs)):
+            support_scores[claim_index] = max(support_scores[claim_index], prediction['entailment'])
+        
+        return support_scores
+    
+    def detect(self, response_text, context, verbose=False):
+        """Score a response for hallucination, returning (score, details)"""
+        claims = extract_factual_claims(response_text)
+        
+        if not claims:
+            score = 0.9  # High score if no factual claims
+            return score, {'message': 'No factual claims detected', 'claims_count': 0}
+        
+        # Check context support
+        support_scores = self.calculate_claim_support(claims, context)
+        supported_count = sum(1 for s in support_scores if s >= self.support_threshold)
+        support_ratio = supported_count / len(claims)
+        
+        # Check for hallucination indicators
+        hallucination_indicators = detect_hallucination_indicators(response_text)
+        indicator_penalty = min(0.3, hallucination_indicators * 0.1)
+        
+        # Calculate final score
+        base_score = support_ratio
+        score = max(0.0, base_score - indicator_penalty)
+        
+        details = {
+            'method': self.mode,
+            'claims_count': len(claims),
+            'supported_claims_count': supported_count,
+            'support_ratio': round(support_ratio, 3),
+            'hallucination_indicators': hallucination_indicators,
+            'context_available': bool(context),
+            'claims_sample': claims[:3]  # Show first 3 claims
+        }
+        
+        # Per-claim breakdown is only built when explicitly requested
+        if verbose:
+            details['claim_details'] = {
+                claim[:50]: round(s, 3) for claim, s in zip(claims, support_scores)
+            }
+        
+        return score, details
+
+
 def main():
     """Main execution function"""
     try:
@@ -112,37 +235,13 @@ def main():
         response_id = input_data.get('response_id', 'unknown')
         response_text = input_data.get('response_text', '').strip()
         context = input_data.get('context', '').strip()
+        mode = input_data.get('mode') or os.environ.get('HALLUC_MODE', 'simple')
         
         if not response_text:
             return_error("Empty response")
         
-        # Extract and analyze claims
-        claims = extract_factual_claims(response_text)
-        
-        if not claims:
-            score = 0.9  # High score if no factual claims
-            details = {'message': 'No factual claims detected', 'claims_count': 0}
-        else:
-            # Check context support
-            supported_claims = check_context_support(claims, context)
-            support_ratio = len(supported_claims) / len(claims) if claims else 1.0
-            
-            # Check for hallucination indicators
-            hallucination_indicators = detect_hallucination_indicators(response_text)
-            indicator_penalty = min(0.3, hallucination_indicators * 0.1)
-            
-            # Calculate final score
-            base_score = support_ratio
-            score = max(0.0, base_score - indicator_penalty)
-            
-            details = {
-                'claims_count': len(claims),
-                'supported_claims_count': len(supported_claims),
-                'support_ratio': round(support_ratio, 3),
-                'hallucination_indicators': hallucination_indicators,
-                'context_available': bool(context),
-                'claims_sample': claims[:3]  # Show first 3 claims
-            }
+        detector = HallucinationDetector(mode)
+        score, details = detector.detect(response_text, context, verbose=input_data.get('verbose', False))
         
         details['processing_time'] = round(time.time() - start_time, 3)
         
@@ -155,4 +254,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -8,176 +8,335 @@ import sys
 import json
 import re
 import time
+from collections import namedtuple
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:  # Fall back to stdlib json
+    orjson = None
+
+try:
+    import re2 as _rx  # RE2 engine, same search/findall API as re
+except ImportError:
+    _rx = re
 
 
 def load_json_input():
     """Load JSON input from stdin"""
     try:
-        input_data = sys.stdin.read().strip()
-        return json.loads(input_data) if input_data else {}
+        input_data = sys.stdin.buffer.read().strip()
+        if not input_data:
+            return {}
+        return orjson.loads(input_data) if orjson else json.loads(input_data)
     except Exception as e:
         print(f"Input error: {e}", file=sys.stderr)
         return {}
 
 
-def return_score(score, details=None):
-    """Return score as JSON to stdout"""
-    result = {
+_NL = b'\n'
+
+
+def write_json(result):
+    """Write a JSON object as a single line to stdout"""
+    out = sys.stdout.buffer
+    out.write(orjson.dumps(result) if orjson else json.dumps(result).encode())
+    out.write(_NL)
+    out.flush()
+
+
+def make_result(score, details=None):
+    """Build the score result object"""
+    return {
         "score": max(0.0, min(1.0, float(score))),
         "details": details or {}
     }
-    print(json.dumps(result))
-    sys.stdout.flush()
+
+
+def make_error(error_message):
+    """Build the error result object"""
+    return {"score": 0.0, "error": error_message, "details": {}}
+
+
+def return_score(score, details=None):
+    """Return score as JSON to stdout"""
+    write_json(make_result(score, details))
 
 
 def return_error(error_message):
     """Return error and exit"""
-    result = {"score": 0.0, "error": error_message, "details": {}}
-    print(json.dumps(result))
+    write_json(make_error(error_message))
     sys.exit(1)
 
 
 def clean_text(text):
     """Clean text"""
-    return re.sub(r'\s+', ' ', str(text).strip()) if text else ""
-
-
-def evaluate_word_count(response, prompt):
-    """Check word count requirements from prompt"""
-    word_count = len(response.split())
-    
-    # Extract word count requirements
-    patterns = [
-        r'(\d+)\s+words?',
-        r'at least (\d+) words?',
-        r'maximum (\d+) words?',
-        r'between (\d+) and (\d+) words?'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, prompt.lower())
-        if matches:
-            if isinstance(matches[0], tuple) and len(matches[0]) == 2:  # Range format
-                min_words, max_words = int(matches[0][0]), int(matches[0][1])
-                if min_words <= word_count <= max_words:
-                    return 1.0
-                elif word_count < min_words:
-                    return max(0.0, word_count / min_words)
-                else:
-                    return max(0.0, 1.0 - (word_count - max_words) / max_words)
-            else:  # Single number
-                target = int(matches[0] if isinstance(matches[0], str) else matches[0][0])
-                if 'at least' in prompt.lower():
-                    return 1.0 if word_count >= target else max(0.0, word_count / target)
-                elif 'maximum' in prompt.lower():
-                    return 1.0 if word_count <= target else max(0.0, 1.0 - (word_count - target) / target)
-                else:  # Exact or approximate
-                    deviation = abs(word_count - target) / target
-                    return max(0.0, 1.0 - deviation)
-    
-    return 1.0  # No word count requirements found
-
-
-def evaluate_format_requirements(response, prompt):
-    """Check basic format requirements"""
-    score = 1.0
-    details = {}
-    
-    # Check bullet points
-    if re.search(r'bullet\s*points?|list', prompt.lower()):
-        bullet_patterns = [r'^\s*[-*•]\s', r'^\s*\d+\.\s']
-        bullet_count = 0
-        for pattern in bullet_patterns:
-            bullet_count += len(re.findall(pattern, response, re.MULTILINE))
-        
-        if bullet_count >= 3:
-            bullet_score = 1.0
-        elif bullet_count >= 1:
-            bullet_score = 0.7
-        else:
-            bullet_score = 0.3
-        
-        score *= bullet_score
-        details['bullets'] = bullet_count
-    
-    # Check paragraph structure
-    if 'paragraph' in prompt.lower():
-        sentences = len(re.split(r'[.!?]+', response))
-        if sentences >= 3:
-            paragraph_score = 1.0
-        elif sentences >= 2:
-            paragraph_score = 0.8
+    return ' '.join(str(text).split()) if text else ""
+
+
+# Requirement patterns run on the lowercased prompt and use no backreferences
+# or lookaround, so they compile under both RE2 and the stdlib re module.
+
+# Word count requirements, one alternative per requirement kind. A few
+# filler words may sit between the phrase and the number ("a maximum of 50
+# words", "at least 3 paragraphs of 50 words").
+_WORD_FILLER = r'\s*(?:\S+\s+){0,3}?'
+_WORD_UNION = _rx.compile(
+    r'(?P<range>(?:between|from)\s*(\d+)\s*(?:to|and|-)\s*(\d+)\s*words?)'
+    r'|(?P<atleast>at least' + _WORD_FILLER + r'(\d+)\s*words?)'
+    r'|(?P<atmost>(?:no more than|at most|up to|maximum)' + _WORD_FILLER + r'(\d+)\s*words?)'
+    r'|(?P<exact>(\d+)\s+words?)'
+)
+
+_LIST_REQUEST_RE = _rx.compile(r'bullet\s*points?|list')
+_PARAGRAPH_REQUEST_RE = _rx.compile(r'paragraph')
+_SENT_BOUNDARY = _rx.compile(r'[.!?]+')
+_TOKEN_RE = _rx.compile(r'[a-z0-9]+')
+
+# Every requirement pattern above contains one of these keywords
+_REQUIREMENT_KEYWORDS = ('word', 'list', 'bullet', 'paragraph')
+
+_STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+
+
+# Format requirements parsed from a prompt
+# word_count is None or (min_words, max_words); "at least N" has no upper
+# bound, "maximum N" has a lower bound of 0 and "N words" uses N for both
+Requirements = namedtuple('Requirements', ['word_count', 'bullets', 'paragraph'])
+
+_NO_REQUIREMENTS = Requirements(word_count=None, bullets=False, paragraph=False)
+
+
+@lru_cache(maxsize=1024)
+def extract_requirements(prompt):
+    """Extract format requirements from a lowercased prompt (cached per unique prompt)"""
+    if not any(keyword in prompt for keyword in _REQUIREMENT_KEYWORDS):
+        return _NO_REQUIREMENTS  # Skip the regex scans
+    
+    word_count = None
+    match = _WORD_UNION.search(prompt)
+    if match:
+        numbers = [int(n) for n in match.groups() if n is not None and n.isdigit()]
+        if match.group('range'):
+            word_count = (numbers[0], numbers[1])
+        elif match.group('atleast'):
+            word_count = (numbers[0], float('inf'))
+        elif match.group('atmost'):
+            word_count = (0, numbers[0])
         else:
-            paragraph_score = 0.5
+            word_count = (numbers[0], numbers[0])
+    
+    return Requirements(
+        word_count=word_count,
+        bullets=_LIST_REQUEST_RE.search(prompt) is not None,
+        paragraph=_PARAGRAPH_REQUEST_RE.search(prompt) is not None
+    )
+
+
+def _is_bullet_marker(token):
+    """True for '-', '*', '•' or a numbered marker like '12.'"""
+    return token in ('-', '*', '•') or (token[:-1].isdecimal() and token.endswith('.'))
+
+
+def scan_response(response, requirements):
+    """Collect response statistics for the scorers in one pass over its lines.
+    
+    The response must already be normalized by clean_text, so words are
+    separated by exactly one space.
+    """
+    lines = response.split('\n')
+    word_count = 0
+    bullet_count = 0
+    
+    for index, line in enumerate(lines):
+        # Only the first word is needed, the rest are counted by spaces
+        words = line.split(None, 1)
+        if not words:
+            continue
+        word_count += line.count(' ') + 1
         
-        score *= paragraph_score
-        details['sentences'] = sentences
+        # A marker followed by whitespace (or by the newline ending the line)
+        if _is_bullet_marker(words[0]) and (
+            len(words) > 1 or line[-1:].isspace() or index < len(lines) - 1
+        ):
+            bullet_count += 1
+    
+    stats = {'word_count': word_count, 'bullets': bullet_count}
     
-    return score, details
+    if requirements.paragraph:
+        # Same count as len(re.split(...)) without building the fragments
+        stats['sentences'] = len(_SENT_BOUNDARY.findall(response)) + 1
+    
+    return stats
+
 
+def score_word_count(word_count, min_words, max_words):
+    """Score a word count against (min_words, max_words) bounds"""
+    # One bound check covers ranges, minimums, maximums and exact targets
+    # (for an exact target, both branches reduce to 1 - |count - N| / N)
+    if word_count < min_words:
+        return max(0.0, word_count / min_words)
+    elif word_count > max_words:
+        return max(0.0, 1.0 - (word_count - max_words) / max_words)
+    return 1.0
 
-def evaluate_content_relevance(response, prompt):
-    """Simple content relevance check"""
-    prompt_words = set(clean_text(prompt.lower()).split())
-    response_words = set(clean_text(response.lower()).split())
+
+def check_bullets(stats):
+    """Score bullet point structure, returning (detail_key, value, score)"""
+    bullet_count = stats['bullets']
+    
+    if bullet_count >= 3:
+        bullet_score = 1.0
+    elif bullet_count >= 1:
+        bullet_score = 0.7
+    else:
+        bullet_score = 0.3
+    
+    return 'bullets', bullet_count, bullet_score
+
+
+def check_paragraph(stats):
+    """Score paragraph structure, returning (detail_key, value, score)"""
+    sentences = stats['sentences']
+    
+    if sentences >= 3:
+        paragraph_score = 1.0
+    elif sentences >= 2:
+        paragraph_score = 0.8
+    else:
+        paragraph_score = 0.5
+    
+    return 'sentences', sentences, paragraph_score
+
+
+@lru_cache(maxsize=1024)
+def build_scorer(requirements):
+    """Build a response scorer specialized to a prompt's requirements.
+    
+    Only the checks the prompt asks for are included, so scoring a response
+    runs no per-requirement dispatch. Cached per unique requirements.
+    The scorer returns (word_score, format_score, format_details, word_count).
+    """
+    format_checks = []
+    if requirements.bullets:
+        format_checks.append(check_bullets)
+    if requirements.paragraph:
+        format_checks.append(check_paragraph)
     
+    word_bounds = requirements.word_count
+    
+    def scorer(response):
+        stats = scan_response(response, requirements)
+        word_count = stats['word_count']
+        
+        word_score = score_word_count(word_count, *word_bounds) if word_bounds else 1.0
+        
+        format_score = 1.0
+        format_details = {}
+        for check in format_checks:
+            key, value, check_score = check(stats)
+            format_score *= check_score
+            format_details[key] = value
+        
+        return word_score, format_score, format_details, word_count
+    
+    return scorer
+
+
+def evaluate_content_relevance(response, lower_prompt):
+    """Simple content relevance check against a lowercased prompt"""
     # Remove common stop words
-    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-    prompt_keywords = prompt_words - stop_words
-    response_keywords = response_words - stop_words
+    prompt_keywords = frozenset(_TOKEN_RE.findall(lower_prompt)) - _STOP_WORDS
     
     if not prompt_keywords:
         return 0.8
     
-    overlap = len(prompt_keywords.intersection(response_keywords))
+    # Count distinct prompt keywords seen in the response without
+    # building a keyword set for the (usually much longer) response
+    seen = set()
+    for match in _TOKEN_RE.finditer(response.lower()):
+        token = match.group()
+        if token in prompt_keywords:
+            seen.add(token)
+    
+    overlap = len(seen)
     relevance_score = min(1.0, overlap / len(prompt_keywords) * 2)  # Scale up
     
     return relevance_score
 
 
+def evaluate_instruction_following(input_data):
+    """Evaluate one input record, returning (score, details)"""
+    start_time = time.time()
+    
+    response_id = input_data.get('response_id', 'unknown')
+    prompt = clean_text(input_data.get('prompt', ''))
+    response_text = clean_text(input_data.get('response_text', ''))
+    
+    if not response_text:
+        raise ValueError("Empty response")
+    
+    if not prompt:
+        raise ValueError("Empty prompt")
+    
+    # Evaluate different aspects
+    lower_prompt = prompt.lower()
+    scorer = build_scorer(extract_requirements(lower_prompt))
+    word_score, format_score, format_details, word_count = scorer(response_text)
+    relevance_score = evaluate_content_relevance(response_text, lower_prompt)
+    
+    # Combine scores (weighted average)
+    final_score = (
+        0.3 * word_score +
+        0.4 * format_score +
+        0.3 * relevance_score
+    )
+    
+    details = {
+        'word_count_score': round(word_score, 3),
+        'format_score': round(format_score, 3),
+        'relevance_score': round(relevance_score, 3),
+        'format_details': format_details,
+        'processing_time': round(time.time() - start_time, 3),
+        'response_length': word_count
+    }
+    
+    print(f"[InstructionWorker] {response_id}: {final_score:.3f}", file=sys.stderr)
+    return final_score, details
+
+
+def serve():
+    """Evaluate newline-delimited JSON inputs from stdin until EOF.
+    
+    Writes one JSON result line per input line, in order, so the parent can
+    keep a single worker process alive across many evaluations.
+    """
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        try:
+            input_data = orjson.loads(line) if orjson else json.loads(line)
+            score, details = evaluate_instruction_following(input_data)
+            write_json(make_result(score, details))
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            write_json(make_error(str(e)))
+
+
 def main():
     """Main execution function"""
+    if '--serve' in sys.argv[1:]:
+        serve()
+        return
+    
     try:
-        start_time = time.time()
-        
         # Load input
         input_data = load_json_input()
         if not input_data:
             return_error("No input data")
         
-        response_id = input_data.get('response_id', 'unknown')
-        prompt = clean_text(input_data.get('prompt', ''))
-        response_text = clean_text(input_data.get('response_text', ''))
-        
-        if not response_text:
-            return_error("Empty response")
-        
-        if not prompt:
-            return_error("Empty prompt")
-        
-        # Evaluate different aspects
-        word_score = evaluate_word_count(response_text, prompt)
-        format_score, format_details = evaluate_format_requirements(response_text, prompt)
-        relevance_score = evaluate_content_relevance(response_text, prompt)
-        
-        # Combine scores (weighted average)
-        final_score = (
-            0.3 * word_score +
-            0.4 * format_score +
-            0.3 * relevance_score
-        )
-        
-        details = {
-            'word_count_score': round(word_score, 3),
-            'format_score': round(format_score, 3),
-            'relevance_score': round(relevance_score, 3),
-            'format_details': format_details,
-            'processing_time': round(time.time() - start_time, 3),
-            'response_length': len(response_text.split())
-        }
-        
-        print(f"[InstructionWorker] {response_id}: {final_score:.3f}", file=sys.stderr)
-        return_score(final_score, details)
+        score, details = evaluate_instruction_following(input_data)
+        return_score(score, details)
         
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
@@ -185,4 +344,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
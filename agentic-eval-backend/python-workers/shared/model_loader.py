@@ -4,188 +4,521 @@ Handles loading and caching of ML models to avoid repeated loading.
 """
 
 import os
+import shutil
 import sys
-from typing import Optional, Dict, Any
+import tempfile
+import threading
+from collections import OrderedDict
+from statistics import fmean
+from typing import Optional, Dict, Any, List, Tuple
 import torch
 from transformers import AutoTokenizer, AutoModel, AutoModelForSequenceClassification, pipeline
 from sentence_transformers import SentenceTransformer
 
+# Optional: ONNX Runtime export + INT8 dynamic quantization for CPU embeddings
+try:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    HAS_ONNXRUNTIME = True
+except ImportError:
+    HAS_ONNXRUNTIME = False
+
+ONNX_CACHE_DIR = os.environ.get('ONNX_CACHE_DIR', os.path.join('.', 'cache', 'onnx'))
+
+
+class OnnxSentenceEncoder:
+    """Minimal SentenceTransformer-compatible encoder over an ONNX Runtime model.
+    
+    Mean-pools the last hidden state over the attention mask and L2-normalizes,
+    matching the all-MiniLM sentence-transformers pipeline.
+    """
+    
+    def __init__(self, tokenizer, model, max_length: int = 256):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.max_length = max_length
+    
+    def encode(self, texts: list, batch_size: int = 32):
+        batches = []
+        with torch.inference_mode():
+            for start in range(0, len(texts), batch_size):
+                inputs = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                        max_length=self.max_length, return_tensors='pt')
+                token_embeddings = self.model(**inputs).last_hidden_state
+                mask = inputs['attention_mask'].unsqueeze(-1).to(token_embeddings.dtype)
+                pooled = (token_embeddings * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                batches.append(torch.nn.functional.normalize(pooled, p=2, dim=1))
+        if not batches:
+            return torch.zeros((0, 384)).numpy()
+        return torch.cat(batches).numpy()
+
+
 class ModelLoader:
     """Singleton class for loading and caching ML models."""
     
     _instance = None
-    _models = {}
+    _instance_lock = threading.Lock()
+    _models = OrderedDict()  # cache_key -> model, least recently used first
     
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(ModelLoader, cls).__new__(cls)
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = super(ModelLoader, cls).__new__(cls)
         return cls._instance
     
     def __init__(self):
-        if not hasattr(self, 'initialized'):
-            self.initialized = True
+        if hasattr(self, 'initialized'):
+            return
+        with self._instance_lock:
+            if hasattr(self, 'initialized'):
+                return
+            # Per-model locks so concurrent callers never load the same model twice
+            self._lock = threading.Lock()
+            self._key_locks = {}
             self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-            print(f"ModelLoader initialized with device: {self.device}", file=sys.stderr)
+            # Half precision on GPU: bf16 where supported (Ampere+), else fp16
+            if self.device.type == 'cuda':
+                self.dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+            else:
+                self.dtype = torch.float32
+            # INT8 ONNX Runtime embeddings on CPU; set USE_ONNX_EMBEDDINGS=0 to disable
+            self.use_onnx = os.environ.get('USE_ONNX_EMBEDDINGS', '1') != '0'
+            # torch.compile (CUDA graphs) for NLI/BERT on GPU, opt-in with TORCH_COMPILE=1.
+            # Compilation only pays off in a long-lived process: one-shot workers
+            # would recompile on every request.
+            self.use_compile = (self.device.type == 'cuda' and hasattr(torch, 'compile')
+                                and os.environ.get('TORCH_COMPILE', '0') == '1')
+            # Side stream for host-to-device input copies that overlap with compute
+            self._copy_stream = torch.cuda.Stream() if self.device.type == 'cuda' else None
+            # Keep at most this many models resident; least recently used is evicted
+            self._max_models = int(os.environ.get('MAX_LOADED_MODELS', '4'))
+            # Models whose load failed for good, kept out of the LRU so they never take a slot
+            self._failed_models = set()
+            self.initialized = True
+            print(f"ModelLoader initialized with device: {self.device}, dtype: {self.dtype}", file=sys.stderr)
+    
+    def _loading_lock(self, cache_key: str) -> threading.Lock:
+        """Return the lock guarding the lazy load of one cached model."""
+        with self._lock:
+            return self._key_locks.setdefault(cache_key, threading.Lock())
+    
+    def _store_model(self, cache_key: str, model: Any) -> None:
+        """Cache a loaded model, evicting the least recently used beyond _max_models."""
+        evicted = []
+        with self._lock:
+            self._models[cache_key] = model
+            self._models.move_to_end(cache_key)
+            while len(self._models) > self._max_models:
+                evicted.append(self._models.popitem(last=False))
+        
+        if not evicted:
+            return
+        print(f"Evicted models from cache: {', '.join(key for key, _ in evicted)}", file=sys.stderr)
+        # Drop the last references before releasing cached GPU memory
+        del evicted
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    
+    def _use_model(self, cache_key: str) -> Any:
+        """Return a cached model and mark it as most recently used, or None if not cached."""
+        with self._lock:
+            model = self._models.get(cache_key)
+            if model is not None:
+                self._models.move_to_end(cache_key)
+            return model
+    
+    def _from_pretrained(self, model_class, model_name: str):
+        """Load pretrained weights with the fastest attention kernel available.
+        
+        Tries FlashAttention-2 (half precision on GPU with flash-attn installed),
+        then PyTorch SDPA, then the model's default attention. Weights are
+        always loaded directly in self.dtype rather than as fp32 on the host.
+        """
+        attn_implementations = ['sdpa']
+        if self.dtype != torch.float32:
+            attn_implementations.insert(0, 'flash_attention_2')
+        
+        for attn_implementation in attn_implementations:
+            try:
+                # torch_dtype= is accepted by every release with attn_implementation=
+                # (4.36+); dtype= only exists from 4.56
+                return model_class.from_pretrained(model_name, torch_dtype=self.dtype,
+                                                   attn_implementation=attn_implementation)
+            except (ValueError, ImportError, TypeError) as e:
+                # TypeError: transformers too old for attn_implementation=
+                print(f"{attn_implementation} attention unavailable for {model_name}: {e}", file=sys.stderr)
+        
+        return model_class.from_pretrained(model_name, torch_dtype=self.dtype)
+    
+    def _prepare_model(self, model):
+        """Move a transformer model to the device and precision, in eval mode.
+        
+        Only for encoder classifiers (NLI/BERT): seq2seq checkpoints such as
+        T5 overflow in fp16 and must not be cast with this helper.
+        """
+        model.to(self.device, dtype=self.dtype)
+        model.eval()
+        return model
+    
+    def _compile_model(self, model):
+        """Wrap an encoder with torch.compile when enabled; eager otherwise.
+        
+        Inputs should be padded to bucketed lengths (see _bucket_length) so the
+        compiled graph is reused instead of recompiled per shape.
+        """
+        if not self.use_compile:
+            return model
+        try:
+            return torch.compile(model, mode="reduce-overhead", dynamic=False, fullgraph=False)
+        except Exception as e:
+            print(f"torch.compile unavailable, using eager mode: {e}", file=sys.stderr)
+            return model
+    
+    @staticmethod
+    def _bucket_length(length: int, max_length: int = 512) -> int:
+        """Round a sequence length up to the next power of two (16..max_length)."""
+        bucket = 16
+        while bucket < length:
+            bucket *= 2
+        return min(bucket, max_length)
     
     def get_sentence_transformer(self, model_name: str = 'all-MiniLM-L6-v2') -> SentenceTransformer:
         """Load sentence transformer model for embeddings."""
         cache_key = f"sentence_transformer_{model_name}"
         
-        if cache_key not in self._models:
+        cached = self._use_model(cache_key)
+        if cached is None:
+            with self._loading_lock(cache_key):
+                cached = self._use_model(cache_key)
+                if cached is None:
+                    try:
+                        print(f"Loading sentence transformer: {model_name}", file=sys.stderr)
+                        cached = SentenceTransformer(model_name, device=self.device)
+                        self._store_model(cache_key, cached)
+                        print(f"Successfully loaded {model_name}", file=sys.stderr)
+                    except Exception as e:
+                        print(f"Failed to load sentence transformer {model_name}: {e}", file=sys.stderr)
+                        # Fallback to smaller model
+                        try:
+                            cached = SentenceTransformer('all-MiniLM-L12-v2', device=self.device)
+                            self._store_model(cache_key, cached)
+                            print("Loaded fallback sentence transformer", file=sys.stderr)
+                        except Exception as e2:
+                            print(f"Failed to load fallback model: {e2}", file=sys.stderr)
+                            raise e2
+        
+        return cached
+    
+    @staticmethod
+    def _export_onnx_model(model_id: str, save_dir: str) -> None:
+        """Export and INT8-quantize a model into save_dir, atomically.
+        
+        The export is written to a private temp dir and renamed into place, so
+        concurrent worker processes never see (or write) a partial export; if
+        another process finished first, its copy is kept.
+        """
+        parent = os.path.dirname(save_dir)
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix='.export-', dir=parent)
+        try:
+            ort_model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+            ort_model.save_pretrained(tmp_dir)
+            AutoTokenizer.from_pretrained(model_id).save_pretrained(tmp_dir)
+            quantizer = ORTQuantizer.from_pretrained(ort_model)
+            qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            quantizer.quantize(save_dir=tmp_dir, quantization_config=qconfig)
             try:
-                print(f"Loading sentence transformer: {model_name}", file=sys.stderr)
-                model = SentenceTransformer(model_name, device=self.device)
-                self._models[cache_key] = model
-                print(f"Successfully loaded {model_name}", file=sys.stderr)
-            except Exception as e:
-                print(f"Failed to load sentence transformer {model_name}: {e}", file=sys.stderr)
-                # Fallback to smaller model
-                try:
-                    model = SentenceTransformer('all-MiniLM-L12-v2', device=self.device)
-                    self._models[cache_key] = model
-                    print("Loaded fallback sentence transformer", file=sys.stderr)
-                except Exception as e2:
-                    print(f"Failed to load fallback model: {e2}", file=sys.stderr)
-                    raise e2
-        
-        return self._models[cache_key]
+                os.rename(tmp_dir, save_dir)
+            except OSError:
+                if not os.path.isdir(save_dir):
+                    raise
+                # Lost the race to another process; use its export
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    def get_sentence_transformer_onnx(self, model_name: str = 'all-MiniLM-L6-v2') -> Optional[OnnxSentenceEncoder]:
+        """Load an INT8-quantized ONNX Runtime encoder for CPU embeddings.
+        
+        The model is exported and dynamically quantized on first use and the
+        result is kept under ONNX_CACHE_DIR. Returns None when optimum /
+        onnxruntime are not installed or the export fails.
+        """
+        cache_key = f"onnx_sentence_transformer_{model_name}"
+        
+        cached = self._use_model(cache_key)
+        if cached is None:
+            with self._loading_lock(cache_key):
+                cached = self._use_model(cache_key)
+                if cached is None and cache_key not in self._failed_models:
+                    if HAS_ONNXRUNTIME:
+                        try:
+                            model_id = model_name
+                            if '/' not in model_id and not os.path.isdir(model_id):
+                                model_id = f"sentence-transformers/{model_id}"
+                            save_dir = os.path.join(ONNX_CACHE_DIR, model_id.strip('/').replace('/', '_'))
+                            quantized_file = 'model_quantized.onnx'
+                            
+                            if not os.path.exists(os.path.join(save_dir, quantized_file)):
+                                print(f"Exporting {model_name} to ONNX (INT8)", file=sys.stderr)
+                                self._export_onnx_model(model_id, save_dir)
+                            
+                            tokenizer = AutoTokenizer.from_pretrained(save_dir)
+                            model = ORTModelForFeatureExtraction.from_pretrained(save_dir, file_name=quantized_file)
+                            cached = OnnxSentenceEncoder(tokenizer, model)
+                            self._store_model(cache_key, cached)
+                            print(f"Successfully loaded ONNX encoder for {model_name}", file=sys.stderr)
+                        except Exception as e:
+                            print(f"ONNX export failed for {model_name}: {e}", file=sys.stderr)
+                    if cached is None:
+                        # Remember the failure so the export is not retried on every call
+                        with self._lock:
+                            self._failed_models.add(cache_key)
+        
+        return cached
     
     def get_nli_model(self, model_name: str = 'roberta-large-mnli') -> tuple:
         """Load NLI model for entailment detection."""
         cache_key = f"nli_{model_name}"
         
-        if cache_key not in self._models:
-            try:
-                print(f"Loading NLI model: {model_name}", file=sys.stderr)
-                
-                # Try to load the model
-                tokenizer = AutoTokenizer.from_pretrained(model_name)
-                model = AutoModelForSequenceClassification.from_pretrained(model_name)
-                model.to(self.device)
-                model.eval()
-                
-                self._models[cache_key] = (tokenizer, model)
-                print(f"Successfully loaded NLI model: {model_name}", file=sys.stderr)
-                
-            except Exception as e:
-                print(f"Failed to load NLI model {model_name}: {e}", file=sys.stderr)
-                # Try fallback models
-                fallback_models = ['facebook/bart-large-mnli', 'microsoft/deberta-base-mnli']
-                
-                for fallback in fallback_models:
+        cached = self._use_model(cache_key)
+        if cached is None:
+            with self._loading_lock(cache_key):
+                cached = self._use_model(cache_key)
+                if cached is None:
                     try:
-                        print(f"Trying fallback NLI model: {fallback}", file=sys.stderr)
-                        tokenizer = AutoTokenizer.from_pretrained(fallback)
-                        model = AutoModelForSequenceClassification.from_pretrained(fallback)
-                        model.to(self.device)
-                        model.eval()
+                        print(f"Loading NLI model: {model_name}", file=sys.stderr)
+                        
+                        # Try to load the model
+                        tokenizer = AutoTokenizer.from_pretrained(model_name)
+                        model = self._from_pretrained(AutoModelForSequenceClassification, model_name)
+                        model = self._compile_model(self._prepare_model(model))
                         
-                        self._models[cache_key] = (tokenizer, model)
-                        print(f"Successfully loaded fallback NLI model: {fallback}", file=sys.stderr)
-                        break
-                    except Exception as e2:
-                        print(f"Failed to load fallback {fallback}: {e2}", file=sys.stderr)
-                        continue
-                else:
-                    raise Exception("Failed to load any NLI model")
+                        cached = (tokenizer, model)
+                        self._store_model(cache_key, cached)
+                        print(f"Successfully loaded NLI model: {model_name}", file=sys.stderr)
+                        
+                    except Exception as e:
+                        print(f"Failed to load NLI model {model_name}: {e}", file=sys.stderr)
+                        # Try fallback models
+                        fallback_models = ['facebook/bart-large-mnli', 'microsoft/deberta-base-mnli']
+                        
+                        for fallback in fallback_models:
+                            try:
+                                print(f"Trying fallback NLI model: {fallback}", file=sys.stderr)
+                                tokenizer = AutoTokenizer.from_pretrained(fallback)
+                                model = self._from_pretrained(AutoModelForSequenceClassification, fallback)
+                                model = self._compile_model(self._prepare_model(model))
+                                
+                                cached = (tokenizer, model)
+                                self._store_model(cache_key, cached)
+                                print(f"Successfully loaded fallback NLI model: {fallback}", file=sys.stderr)
+                                break
+                            except Exception as e2:
+                                print(f"Failed to load fallback {fallback}: {e2}", file=sys.stderr)
+                                continue
+                        else:
+                            raise Exception("Failed to load any NLI model")
         
-        return self._models[cache_key]
+        return cached
     
     def get_bert_model(self, model_name: str = 'bert-base-uncased') -> tuple:
         """Load BERT model for embeddings or classification."""
         cache_key = f"bert_{model_name}"
         
-        if cache_key not in self._models:
-            try:
-                print(f"Loading BERT model: {model_name}", file=sys.stderr)
-                tokenizer = AutoTokenizer.from_pretrained(model_name)
-                model = AutoModel.from_pretrained(model_name)
-                model.to(self.device)
-                model.eval()
-                
-                self._models[cache_key] = (tokenizer, model)
-                print(f"Successfully loaded BERT model: {model_name}", file=sys.stderr)
-                
-            except Exception as e:
-                print(f"Failed to load BERT model {model_name}: {e}", file=sys.stderr)
-                raise e
+        cached = self._use_model(cache_key)
+        if cached is None:
+            with self._loading_lock(cache_key):
+                cached = self._use_model(cache_key)
+                if cached is None:
+                    try:
+                        print(f"Loading BERT model: {model_name}", file=sys.stderr)
+                        tokenizer = AutoTokenizer.from_pretrained(model_name)
+                        model = self._from_pretrained(AutoModel, model_name)
+                        model = self._compile_model(self._prepare_model(model))
+                        
+                        cached = (tokenizer, model)
+                        self._store_model(cache_key, cached)
+                        print(f"Successfully loaded BERT model: {model_name}", file=sys.stderr)
+                        
+                    except Exception as e:
+                        print(f"Failed to load BERT model {model_name}: {e}", file=sys.stderr)
+                        raise e
         
-        return self._models[cache_key]
+        return cached
     
     def get_classification_pipeline(self, task: str = 'text-classification', 
                                    model_name: Optional[str] = None) -> pipeline:
         """Get a Hugging Face pipeline for classification tasks."""
         cache_key = f"pipeline_{task}_{model_name or 'default'}"
         
-        if cache_key not in self._models:
-            try:
-                print(f"Loading classification pipeline: {task}", file=sys.stderr)
-                
-                if model_name:
-                    pipe = pipeline(task, model=model_name, device=0 if torch.cuda.is_available() else -1)
-                else:
-                    pipe = pipeline(task, device=0 if torch.cuda.is_available() else -1)
-                
-                self._models[cache_key] = pipe
-                print(f"Successfully loaded pipeline: {task}", file=sys.stderr)
-                
-            except Exception as e:
-                print(f"Failed to load pipeline {task}: {e}", file=sys.stderr)
-                # Try CPU version
-                try:
-                    if model_name:
-                        pipe = pipeline(task, model=model_name, device=-1)
-                    else:
-                        pipe = pipeline(task, device=-1)
-                    
-                    self._models[cache_key] = pipe
-                    print(f"Successfully loaded CPU pipeline: {task}", file=sys.stderr)
-                except Exception as e2:
-                    print(f"Failed to load CPU pipeline: {e2}", file=sys.stderr)
-                    raise e2
-        
-        return self._models[cache_key]
+        cached = self._use_model(cache_key)
+        if cached is None:
+            with self._loading_lock(cache_key):
+                cached = self._use_model(cache_key)
+                if cached is None:
+                    try:
+                        print(f"Loading classification pipeline: {task}", file=sys.stderr)
+                        
+                        if model_name:
+                            pipe = pipeline(task, model=model_name, device=0 if torch.cuda.is_available() else -1)
+                        else:
+                            pipe = pipeline(task, device=0 if torch.cuda.is_available() else -1)
+                        
+                        cached = pipe
+                        self._store_model(cache_key, cached)
+                        print(f"Successfully loaded pipeline: {task}", file=sys.stderr)
+                        
+                    except Exception as e:
+                        print(f"Failed to load pipeline {task}: {e}", file=sys.stderr)
+                        # Try CPU version
+                        try:
+                            if model_name:
+                                pipe = pipeline(task, model=model_name, device=-1)
+                            else:
+                                pipe = pipeline(task, device=-1)
+                            
+                            cached = pipe
+                            self._store_model(cache_key, cached)
+                            print(f"Successfully loaded CPU pipeline: {task}", file=sys.stderr)
+                        except Exception as e2:
+                            print(f"Failed to load CPU pipeline: {e2}", file=sys.stderr)
+                            raise e2
+        
+        return cached
     
     def predict_nli(self, premise: str, hypothesis: str, model_name: str = 'roberta-large-mnli') -> Dict[str, float]:
         """Predict NLI relationship between premise and hypothesis."""
+        return self.predict_nli_batch([(premise, hypothesis)], model_name)[0]
+    
+    def predict_nli_batch(self, pairs: List[Tuple[str, str]], model_name: str = 'roberta-large-mnli',
+                          batch_size: int = 32) -> List[Dict[str, float]]:
+        """Predict NLI relationships for many (premise, hypothesis) pairs.
+        
+        Pairs are sorted by length and run in mini-batches so each batch pads to
+        similar lengths; results are returned in the input order. On GPU the
+        next batch is tokenized and copied on a side stream while the current
+        batch runs.
+        """
+        if not pairs:
+            return []
+        
+        # Map to labels (MNLI format: contradiction, neutral, entailment)
+        labels = ['contradiction', 'neutral', 'entailment']
+        
         try:
             tokenizer, model = self.get_nli_model(model_name)
             
-            # Tokenize input
-            inputs = tokenizer(premise, hypothesis, return_tensors="pt", 
-                             truncation=True, padding=True, max_length=512)
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+            batches = [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+            results = [None] * len(pairs)
             
-            # Get prediction
-            with torch.no_grad():
-                outputs = model(**inputs)
-                predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
-            
-            # Convert to probabilities
-            probs = predictions.cpu().numpy()[0]
-            
-            # Map to labels (MNLI format: contradiction, neutral, entailment)
-            labels = ['contradiction', 'neutral', 'entailment']
-            result = {label: float(prob) for label, prob in zip(labels, probs)}
+            next_inputs = self._stage_nli_inputs(tokenizer, pairs, batches[0])
+            for index, batch in enumerate(batches):
+                inputs = next_inputs
+                if self._copy_stream is not None:
+                    # Wait for this batch's copy; keep its memory alive on the compute stream
+                    compute_stream = torch.cuda.current_stream()
+                    compute_stream.wait_stream(self._copy_stream)
+                    for tensor in inputs.values():
+                        tensor.record_stream(compute_stream)
+                
+                # Get prediction (launched asynchronously on GPU)
+                with torch.inference_mode():
+                    outputs = model(**inputs)
+                    predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
+                
+                # Prefetch the next batch while the forward pass runs
+                if index + 1 < len(batches):
+                    next_inputs = self._stage_nli_inputs(tokenizer, pairs, batches[index + 1])
+                
+                # Convert to probabilities
+                for i, probs in zip(batch, predictions.float().cpu().numpy()):
+                    results[i] = {label: float(prob) for label, prob in zip(labels, probs)}
             
-            return result
+            return results
             
         except Exception as e:
             print(f"NLI prediction failed: {e}", file=sys.stderr)
-            return {'contradiction': 0.33, 'neutral': 0.33, 'entailment': 0.33}
+            return [{'contradiction': 0.33, 'neutral': 0.33, 'entailment': 0.33} for _ in pairs]
     
-    def get_embeddings(self, texts: list, model_name: str = 'all-MiniLM-L6-v2') -> list:
-        """Get sentence embeddings for a list of texts."""
+    def _stage_nli_inputs(self, tokenizer, pairs: List[Tuple[str, str]], batch: List[int]) -> Dict[str, torch.Tensor]:
+        """Tokenize one NLI batch and start copying it to the device.
+        
+        On GPU the copy is issued from pinned memory on the side copy stream,
+        so callers must wait on that stream before using the tensors.
+        """
+        # Compiled models get bucketed padding so graphs are reused
+        premises = [pairs[i][0] for i in batch]
+        hypotheses = [pairs[i][1] for i in batch]
+        if self.use_compile:
+            encodings = tokenizer(premises, hypotheses, truncation=True, max_length=512)
+            longest = max(len(ids) for ids in encodings['input_ids'])
+            inputs = tokenizer.pad(encodings, padding='max_length',
+                                   max_length=self._bucket_length(longest), return_tensors="pt")
+        else:
+            inputs = tokenizer(premises, hypotheses, return_tensors="pt",
+                               truncation=True, padding=True, max_length=512)
+        
+        if self._copy_stream is None:
+            return {k: v.to(self.device) for k, v in inputs.items()}
+        with torch.cuda.stream(self._copy_stream):
+            return {k: v.pin_memory().to(self.device, non_blocking=True) for k, v in inputs.items()}
+    
+    def get_embeddings(self, texts: list, model_name: str = 'all-MiniLM-L6-v2',
+                       return_tensor: bool = False):
+        """Get L2-normalized sentence embeddings for a list of texts.
+        
+        With return_tensor=True the embeddings stay on the model device as a
+        torch.Tensor instead of being copied back to host memory; otherwise
+        encode writes straight into a numpy array.
+        """
         try:
+            if self.device.type == 'cpu' and self.use_onnx:
+                encoder = self.get_sentence_transformer_onnx(model_name)
+                if encoder is not None:
+                    embeddings = encoder.encode(texts)
+                    return torch.from_numpy(embeddings) if return_tensor else embeddings
             model = self.get_sentence_transformer(model_name)
-            embeddings = model.encode(texts, convert_to_tensor=True)
-            return embeddings.cpu().numpy()
+            # encode already length-sorts texts internally before batching
+            return model.encode(texts, batch_size=64, show_progress_bar=False,
+                                normalize_embeddings=True,
+                                convert_to_tensor=return_tensor, convert_to_numpy=not return_tensor)
         except Exception as e:
             print(f"Embedding generation failed: {e}", file=sys.stderr)
             # Return zero embeddings as fallback
+            if return_tensor:
+                return torch.zeros((len(texts), 384), device=self.device)
             import numpy as np
             return np.zeros((len(texts), 384))  # Default MiniLM dimension
     
+    def retrieve_relevant_context(self, queries: list, passages: list, top_k: int = 3,
+                                  min_similarity: float = 0.3,
+                                  model_name: str = 'all-MiniLM-L6-v2') -> list:
+        """Return, for each query, the indices of the most similar passages.
+        
+        Similarities are computed on the model device with a single matmul and
+        topk; only the small index/score tensors are copied back to the host.
+        """
+        if not queries or not passages:
+            return [[] for _ in queries]
+        
+        # Embeddings come back L2-normalized, so the dot product is the cosine
+        query_embeds = self.get_embeddings(queries, model_name, return_tensor=True).float()
+        passage_embeds = self.get_embeddings(passages, model_name, return_tensor=True).float()
+        
+        with torch.no_grad():
+            similarities = query_embeds @ passage_embeds.T
+            scores, indices = similarities.topk(min(top_k, len(passages)), dim=1)
+        
+        scores = scores.cpu().numpy()
+        indices = indices.cpu().numpy()
+        
+        return [
+            [int(idx) for idx, score in zip(row_idx, row_scores) if score > min_similarity]
+            for row_idx, row_scores in zip(indices, scores)
+        ]
+    
     def calculate_bert_score(self, candidates: list, references: list) -> Dict[str, float]:
         """Calculate BERTScore between candidates and references."""
         try:
@@ -202,24 +535,52 @@ class ModelLoader:
             
         except Exception as e:
             print(f"BERTScore calculation failed: {e}", file=sys.stderr)
-            # Fallback to simple text similarity
-            from ..shared.utils import calculate_text_similarity
-            
-            similarities = []
-            for cand, ref in zip(candidates, references):
-                sim = calculate_text_similarity(cand, ref)
-                similarities.append(sim)
+            # Fallback to simple text similarity (token sets are memoized per text)
+            from .utils import calculate_text_similarity
             
-            avg_sim = sum(similarities) / len(similarities) if similarities else 0.0
+            similarities = [calculate_text_similarity(cand, ref) for cand, ref in zip(candidates, references)]
+            avg_sim = fmean(similarities) if similarities else 0.0
             return {
                 'precision': avg_sim,
                 'recall': avg_sim,
                 'f1': avg_sim
             }
     
+    def load_embedding_model(self, model_name: str = 'all-MiniLM-L6-v2'):
+        """Load the encoder get_embeddings will use: ONNX on CPU when available."""
+        if self.device.type == 'cpu' and self.use_onnx:
+            encoder = self.get_sentence_transformer_onnx(model_name)
+            if encoder is not None:
+                return encoder
+        return self.get_sentence_transformer(model_name)
+    
+    def preload_all(self, sentence_model: str = 'all-MiniLM-L6-v2',
+                    nli_model: str = 'roberta-large-mnli') -> None:
+        """Load the embedding and NLI models concurrently so the first request
+        of a long-lived process does not pay for them; failures are logged
+        and left to lazy loading.
+        
+        Loads run on daemon threads, so a caller that started preloading in
+        the background never keeps the process alive at exit.
+        """
+        def run(load, *args):
+            try:
+                load(*args)
+            except Exception as e:
+                print(f"Model preload failed: {e}", file=sys.stderr)
+        
+        threads = [threading.Thread(target=run, args=(self.load_embedding_model, sentence_model), daemon=True),
+                   threading.Thread(target=run, args=(self.get_nli_model, nli_model), daemon=True)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    
     def clear_cache(self):
         """Clear model cache to free memory."""
-        self._models.clear()
+        with self._lock:
+            self._models.clear()
+            self._failed_models.clear()
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
         print("Model cache cleared", file=sys.stderr)
@@ -229,6 +590,7 @@ class ModelLoader:
         info = {
             'device': str(self.device),
             'loaded_models': list(self._models.keys()),
+            'max_models': self._max_models,
             'cuda_available': torch.cuda.is_available(),
             'memory_usage': {}
         }
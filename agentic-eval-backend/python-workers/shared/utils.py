@@ -6,43 +6,101 @@ Contains common functions for text processing, claim extraction, and caching.
 import re
 import json
 import hashlib
+import math
 import sys
-from typing import List, Dict, Any, Optional, Tuple
+from functools import lru_cache
+from statistics import NormalDist
+from typing import List, Dict, Any, Optional, Tuple, FrozenSet, Set, Iterator, Sequence
 import numpy as np
 from diskcache import Cache
 
+try:
+    import ahocorasick
+except ImportError:  # Fall back to per-term substring checks
+    ahocorasick = None
+
+try:
+    import orjson
+except ImportError:  # Fall back to stdlib json
+    orjson = None
+
+try:
+    import xxhash
+except ImportError:  # Fall back to hashlib BLAKE2b
+    xxhash = None
+
+try:
+    import lz4.frame
+except ImportError:  # Cached arrays are stored uncompressed
+    lz4 = None
+
+# Precompiled patterns for the text helpers below
+_STRIP_RE = re.compile(r'[^\w\s.,!?;:()\'"/-]')
+# Same substitution as _STRIP_RE for ASCII text, applied with str.translate
+_ASCII_STRIP_TABLE = {i: ' ' for i in range(128) if _STRIP_RE.match(chr(i))}
+_SENT_SPLIT = re.compile(r'[.!?]+')
+# Numbers (years included) or capitalized words (potential proper nouns)
+_ENTITY = re.compile(r'\b\d+\.?\d*\b|\b[A-Z][a-z]+\b')
+_WORD = re.compile(r'\w+')
+
+# Patterns that typically indicate factual claims, as one case-insensitive alternation
+_FACTUAL = re.compile(
+    r'\b(?:is|are|was|were|will be|has|have|had)\b'
+    r'|\b(?:according to|based on|research shows|studies indicate)\b'
+    r'|\b(?:\d+%|\d+ percent|statistics show)\b'
+    r'|\b(?:in|since|by) \d{4}\b',  # Years
+    re.IGNORECASE
+)
+
+# Bullet lines: -, *, •, "1.", "a.", or roman "iii." markers. [^\S\n] is
+# whitespace other than newline, so a match never spans lines.
+_BULLET = re.compile(r'^[^\S\n]*(?:[\-\*\•]|\d+\.|[a-zA-Z]\.|[ivx]+\.)[^\S\n]', re.MULTILINE)
+
 # Initialize cache
 cache = Cache('./cache', size_limit=1e9)  # 1GB cache
 
+_REQUIRED_INPUT_FIELDS = ('response_id', 'prompt', 'response_text')
+_NL = b'\n'
+
 def load_json_input() -> Dict[str, Any]:
     """Load and parse JSON input from stdin."""
     try:
-        input_data = sys.stdin.read().strip()
-        if not input_data:
+        # Parse the raw bytes directly; both parsers ignore surrounding whitespace
+        input_data = sys.stdin.buffer.read()
+        if not input_data.strip():
             raise ValueError("No input data received")
         
-        data = json.loads(input_data)
+        data = orjson.loads(input_data) if orjson else json.loads(input_data)
         
         # Validate required fields
-        required_fields = ['response_id', 'prompt', 'response_text']
-        for field in required_fields:
-            if field not in data:
-                raise ValueError(f"Missing required field: {field}")
+        missing = tuple(field for field in _REQUIRED_INPUT_FIELDS if field not in data)
+        if missing:
+            raise ValueError(f"Missing required field: {', '.join(missing)}")
         
         return data
-    except json.JSONDecodeError as e:
+    except json.JSONDecodeError as e:  # orjson.JSONDecodeError is a subclass
         raise ValueError(f"Invalid JSON input: {e}")
     except Exception as e:
         raise ValueError(f"Error processing input: {e}")
 
+def _write_json(result: Dict[str, Any]) -> None:
+    """Write a JSON object as a single line of bytes to stdout."""
+    out = sys.stdout.buffer
+    try:
+        payload = orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY) if orjson else None
+    except TypeError:
+        payload = None  # e.g. non-str keys; fall back to stdlib json
+    out.write(payload if payload is not None else json.dumps(result).encode())
+    out.write(_NL)
+    out.flush()
+
 def return_score(score: float, details: Optional[Dict] = None) -> None:
     """Return score as JSON to stdout."""
     result = {
         "score": max(0.0, min(1.0, float(score))),  # Ensure score is between 0 and 1
         "details": details or {}
     }
-    print(json.dumps(result))
-    sys.stdout.flush()
+    _write_json(result)
 
 def return_error(error_message: str) -> None:
     """Return error message and exit."""
@@ -51,7 +109,7 @@ def return_error(error_message: str) -> None:
         "error": error_message,
         "details": {}
     }
-    print(json.dumps(result))
+    _write_json(result)
     sys.exit(1)
 
 def clean_text(text: str) -> str:
@@ -59,16 +117,14 @@ def clean_text(text: str) -> str:
     if not isinstance(text, str):
         return ""
     
-    # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text.strip())
-    
     # Remove special characters but keep basic punctuation
-    text = re.sub(r'[^\w\s.,!?;:()\'"/-]', ' ', text)
-    
-    # Remove extra spaces again
-    text = re.sub(r'\s+', ' ', text.strip())
+    if text.isascii():
+        text = text.translate(_ASCII_STRIP_TABLE)
+    else:
+        text = _STRIP_RE.sub(' ', text)
     
-    return text
+    # Collapse whitespace runs to single spaces and trim
+    return ' '.join(text.split())
 
 def extract_sentences(text: str) -> List[str]:
     """Extract sentences from text using simple regex."""
@@ -76,7 +132,7 @@ def extract_sentences(text: str) -> List[str]:
         return []
     
     # Simple sentence splitting on periods, exclamation marks, question marks
-    sentences = re.split(r'[.!?]+', text)
+    sentences = _SENT_SPLIT.split(text)
     
     # Clean and filter sentences
     sentences = [s.strip() for s in sentences if s.strip()]
@@ -87,45 +143,25 @@ def extract_sentences(text: str) -> List[str]:
 def extract_claims(text: str) -> List[str]:
     """Extract factual claims from text."""
     sentences = extract_sentences(text)
-    claims = []
     
-    # Patterns that typically indicate factual claims
-    factual_patterns = [
-        r'\b(is|are|was|were|will be|has|have|had)\b',
-        r'\b(according to|based on|research shows|studies indicate)\b',
-        r'\b(\d+%|\d+ percent|statistics show)\b',
-        r'\b(in \d{4}|since \d{4}|by \d{4})\b'  # Years
-    ]
-    
-    for sentence in sentences:
-        # Check if sentence contains factual indicators
-        for pattern in factual_patterns:
-            if re.search(pattern, sentence.lower()):
-                claims.append(sentence)
-                break
-    
-    return claims
+    # Keep sentences that contain factual indicators
+    return [s for s in sentences if _FACTUAL.search(s)]
 
 def extract_named_entities(text: str) -> List[str]:
     """Extract named entities using simple pattern matching."""
-    entities = []
-    
-    # Capitalized words (potential proper nouns)
-    proper_nouns = re.findall(r'\b[A-Z][a-z]+\b', text)
-    entities.extend(proper_nouns)
-    
-    # Numbers and dates
-    numbers = re.findall(r'\b\d+\.?\d*\b', text)
-    entities.extend(numbers)
-    
-    # Years
-    years = re.findall(r'\b(19|20)\d{2}\b', text)
-    entities.extend(years)
-    
-    # Remove duplicates and short entities
-    entities = list(set([e for e in entities if len(e) > 2]))
-    
-    return entities
+    # Single scan; dict keeps first-seen order while removing duplicates
+    entities = {}
+    for match in _ENTITY.finditer(text):
+        entity = match.group()
+        if len(entity) > 2:
+            entities[entity] = None
+    
+    return list(entities)
+
+@lru_cache(maxsize=1024)
+def _word_set(text: str) -> FrozenSet[str]:
+    """Lowercased word tokens of a text; memoized for repeated references."""
+    return frozenset(_WORD.findall(text.lower()))
 
 def calculate_text_similarity(text1: str, text2: str) -> float:
     """Calculate simple cosine similarity between two texts."""
@@ -133,47 +169,58 @@ def calculate_text_similarity(text1: str, text2: str) -> float:
         return 0.0
     
     # Simple word-based similarity
-    words1 = set(clean_text(text1.lower()).split())
-    words2 = set(clean_text(text2.lower()).split())
+    words1 = _word_set(text1)
+    words2 = _word_set(text2)
     
     if not words1 or not words2:
         return 0.0
     
-    intersection = len(words1.intersection(words2))
-    union = len(words1.union(words2))
+    intersection = len(words1 & words2)
+    union = len(words1) + len(words2) - intersection
     
     return intersection / union if union > 0 else 0.0
 
 def check_word_count(text: str, min_words: int, max_words: int) -> Tuple[bool, int]:
     """Check if text meets word count requirements."""
-    words = clean_text(text).split()
-    word_count = len(words)
+    # clean_text leaves single spaces between words
+    cleaned = clean_text(text)
+    word_count = cleaned.count(' ') + 1 if cleaned else 0
     
     meets_requirement = min_words <= word_count <= max_words
     return meets_requirement, word_count
 
 def check_bullet_points(text: str, required_count: int) -> Tuple[bool, int]:
     """Check if text contains required number of bullet points."""
-    # Common bullet point patterns
-    bullet_patterns = [
-        r'^\s*[\-\*\•]\s',  # -, *, •
-        r'^\s*\d+\.\s',      # 1., 2., etc.
-        r'^\s*[a-zA-Z]\.\s', # a., b., etc.
-        r'^\s*[ivx]+\.\s'    # i., ii., iii., etc.
-    ]
-    
-    lines = text.split('\n')
-    bullet_count = 0
-    
-    for line in lines:
-        for pattern in bullet_patterns:
-            if re.search(pattern, line, re.MULTILINE):
-                bullet_count += 1
-                break
+    # At most one match per line, since each match is anchored at a line start
+    bullet_count = sum(1 for _ in _BULLET.finditer(text))
     
     meets_requirement = bullet_count >= required_count
     return meets_requirement, bullet_count
 
+@lru_cache(maxsize=256)
+def _build_term_automaton(terms: FrozenSet[str]) -> Any:
+    """Build an Aho-Corasick automaton over lowercased terms."""
+    automaton = ahocorasick.Automaton()
+    for term in terms:
+        automaton.add_word(term, term)
+    automaton.make_automaton()
+    return automaton
+
+def find_terms(text_lower: str, terms: List[str]) -> Set[str]:
+    """Return the lowercased terms that occur in already-lowercased text."""
+    # Like `'' in text`, an empty term is always present
+    present = {''} if any(not term for term in terms) else set()
+    needles = frozenset(term.lower() for term in terms if term)
+    if not needles:
+        return present
+    
+    if ahocorasick is None:
+        present.update(needle for needle in needles if needle in text_lower)
+    else:
+        automaton = _build_term_automaton(needles)
+        present.update(needle for _, needle in automaton.iter(text_lower))
+    return present
+
 def check_format_requirements(text: str, requirements: Dict[str, Any]) -> Dict[str, Any]:
     """Check various format requirements."""
     results = {}
@@ -191,26 +238,24 @@ def check_format_requirements(text: str, requirements: Dict[str, Any]) -> Dict[s
         meets_req, count = check_bullet_points(text, required_count)
         results['bullet_points'] = {'meets_requirement': meets_req, 'count': count}
     
+    # Required and forbidden terms share a single scan over the lowercased text
+    required_terms = requirements.get('required_terms')
+    forbidden_terms = requirements.get('forbidden_terms')
+    if required_terms is not None or forbidden_terms is not None:
+        present = find_terms(text.lower(), list(required_terms or []) + list(forbidden_terms or []))
+    
     # Required terms
-    if 'required_terms' in requirements:
-        terms = requirements['required_terms']
-        found_terms = []
-        for term in terms:
-            if term.lower() in text.lower():
-                found_terms.append(term)
+    if required_terms is not None:
+        found_terms = [term for term in required_terms if term.lower() in present]
         results['required_terms'] = {
-            'meets_requirement': len(found_terms) == len(terms),
+            'meets_requirement': len(found_terms) == len(required_terms),
             'found': found_terms,
-            'missing': [t for t in terms if t not in found_terms]
+            'missing': [t for t in required_terms if t.lower() not in present]
         }
     
     # Forbidden terms
-    if 'forbidden_terms' in requirements:
-        terms = requirements['forbidden_terms']
-        found_forbidden = []
-        for term in terms:
-            if term.lower() in text.lower():
-                found_forbidden.append(term)
+    if forbidden_terms is not None:
+        found_forbidden = [term for term in forbidden_terms if term.lower() in present]
         results['forbidden_terms'] = {
             'meets_requirement': len(found_forbidden) == 0,
             'found': found_forbidden
@@ -218,31 +263,95 @@ def check_format_requirements(text: str, requirements: Dict[str, Any]) -> Dict[s
     
     return results
 
+def _dumps_sorted(obj: Any) -> bytes:
+    """Serialize to compact JSON bytes with sorted keys (orjson when available).
+    
+    The stdlib fallback is not byte-identical to orjson (e.g. 1e16 serializes
+    as 1e+16 and NaN as NaN rather than null), so cache keys differ between
+    environments with and without orjson. That only costs cache misses.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            pass  # e.g. non-str dict keys; let stdlib json handle them
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode()
+
 def create_cache_key(*args) -> str:
     """Create a cache key from arguments."""
-    key_string = json.dumps(args, sort_keys=True)
-    return hashlib.md5(key_string.encode()).hexdigest()
+    key_bytes = _dumps_sorted(args)
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(key_bytes)
+    return hashlib.blake2b(key_bytes, digest_size=16).hexdigest()
+
+# Tags for cache values stored in a compact encoding instead of pickle
+_NDARRAY_TAG = '__ndarray__'
+_ORJSON_TAG = '__orjson__'
+
+def _is_json_native(value: Any) -> bool:
+    """True if value round-trips through JSON unchanged (no tuples, NaN, numpy, ...)."""
+    value_type = type(value)
+    if value_type in (str, int, bool) or value is None:
+        return True
+    if value_type is float:
+        return math.isfinite(value)
+    if value_type is list:
+        return all(_is_json_native(item) for item in value)
+    if value_type is dict:
+        return all(type(key) is str and _is_json_native(item) for key, item in value.items())
+    return False
+
+def _encode_cached(result: Any) -> Any:
+    """Encode numpy arrays as raw (lz4-compressed) bytes and JSON-native dicts as orjson."""
+    # Only plain numeric/bool dtypes round-trip through (dtype.str, raw bytes);
+    # object arrays hold pointers and structured dtypes lose their fields, so
+    # those stay with pickle
+    if isinstance(result, np.ndarray) and result.dtype.kind in 'biufc':
+        payload = np.ascontiguousarray(result).tobytes()
+        codec = None
+        if lz4 is not None:
+            payload = lz4.frame.compress(payload)
+            codec = 'lz4'
+        return (_NDARRAY_TAG, codec, result.dtype.str, result.shape, payload)
+    # Anything JSON would change (tuples, NaN, datetimes, numpy values, dict
+    # subclasses) is left for diskcache to pickle
+    if orjson is not None and type(result) is dict and _is_json_native(result):
+        try:
+            return (_ORJSON_TAG, orjson.dumps(result))
+        except TypeError:
+            pass  # e.g. ints beyond 64 bits
+    return result
+
+def _decode_cached(value: Any) -> Any:
+    """Inverse of _encode_cached; arrays come back read-only (np.frombuffer)."""
+    if isinstance(value, tuple) and value:
+        if value[0] == _NDARRAY_TAG:
+            _, codec, dtype, shape, payload = value
+            if codec == 'lz4':
+                payload = lz4.frame.decompress(payload)
+            return np.frombuffer(payload, dtype=dtype).reshape(shape)
+        if value[0] == _ORJSON_TAG:
+            return orjson.loads(value[1])
+    return value
 
 def get_cached_result(cache_key: str) -> Optional[Any]:
     """Get cached result."""
     try:
-        return cache.get(cache_key)
+        return _decode_cached(cache.get(cache_key))
     except:
         return None
 
 def set_cached_result(cache_key: str, result: Any, ttl: int = 3600) -> None:
     """Set cached result with TTL."""
     try:
-        cache.set(cache_key, result, expire=ttl)
+        cache.set(cache_key, _encode_cached(result), expire=ttl)
     except:
         pass  # Ignore cache errors
 
-def batch_process(items: List[Any], batch_size: int = 32) -> List[List[Any]]:
-    """Split items into batches for processing."""
-    batches = []
+def batch_process(items: Sequence[Any], batch_size: int = 32) -> Iterator[Sequence[Any]]:
+    """Yield successive batches of items; numpy arrays are yielded as views."""
     for i in range(0, len(items), batch_size):
-        batches.append(items[i:i + batch_size])
-    return batches
+        yield items[i:i + batch_size]
 
 def safe_divide(numerator: float, denominator: float, default: float = 0.0) -> float:
     """Safely divide two numbers, returning default if denominator is 0."""
@@ -255,19 +364,25 @@ def normalize_score(score: float, min_val: float = 0.0, max_val: float = 1.0) ->
     """Normalize score to be between min_val and max_val."""
     return max(min_val, min(max_val, score))
 
+@lru_cache(maxsize=16)
+def _z_score(confidence: float) -> float:
+    """Two-sided standard normal quantile for a confidence level."""
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
 def calculate_confidence_interval(scores: List[float], confidence: float = 0.95) -> Tuple[float, float]:
     """Calculate confidence interval for a list of scores."""
+    if not 0 < confidence < 1:
+        raise ValueError(f"confidence must be between 0 and 1 (exclusive), got {confidence}")
+    
     if not scores:
         return (0.0, 0.0)
     
-    scores_array = np.array(scores)
-    mean = np.mean(scores_array)
-    std = np.std(scores_array)
-    n = len(scores_array)
+    scores_array = np.asarray(scores, dtype=np.float64)
+    mean = float(scores_array.mean())
+    variance = float(scores_array.var())
     
     # Simple approximation using normal distribution
-    z_score = 1.96 if confidence == 0.95 else 2.58  # 95% or 99%
-    margin_error = z_score * (std / np.sqrt(n))
+    margin_error = _z_score(confidence) * math.sqrt(variance / scores_array.size)
     
     return (mean - margin_error, mean + margin_error)
 
@@ -291,7 +406,8 @@ class TextProcessor:
     @staticmethod
     def count_words(text: str) -> int:
         """Count words in text."""
-        return len(clean_text(text).split())
+        cleaned = clean_text(text)
+        return cleaned.count(' ') + 1 if cleaned else 0
     
     @staticmethod
     def count_sentences(text: str) -> int: